@@ -1,6 +1,8 @@
 from importlib.metadata import version as _metadata_version
 
-from .node import Node
+from ._jit import jit
+from .node import Node, SyncNode
+from .orchestrator import Orchestrator
 
-__all__ = ("__version__", "Node", "Orchestrator")
+__all__ = ("__version__", "Node", "SyncNode", "Orchestrator", "jit")
 __version__ = _metadata_version("tidydag")
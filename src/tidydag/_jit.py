@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import functools
+from collections.abc import Callable, Iterable
+from typing import Any, overload
+
+
+class JitKernel:
+    """A numeric function compiled with Numba the first time it is needed.
+
+    If Numba is not installed the kernel runs the plain Python function.
+    """
+
+    def __init__(
+        self,
+        func: Callable[..., Any],
+        signatures: Iterable[Any] = (),
+        parallel: bool = False,
+        cache: bool = True,
+    ):
+        """Initialize the kernel.
+
+        Args:
+            func: The function to compile.
+            signatures: Numba signatures compiled eagerly by compile().
+            parallel: Whether Numba parallelizes the function.
+            cache: Whether Numba caches the compiled function on disk.
+        """
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.signatures = tuple(signatures)
+        self.parallel = parallel
+        self.cache = cache
+        self._compiled: Callable[..., Any] | None = None
+
+    def compile(self) -> Callable[..., Any]:
+        """Compile the kernel, including every declared signature.
+
+        Returns:
+            The compiled function, or the plain function if Numba is not installed.
+        """
+        if self._compiled is not None:
+            return self._compiled
+
+        try:
+            import numba
+        except ImportError:
+            self._compiled = self.func
+            return self._compiled
+
+        dispatcher = numba.njit(parallel=self.parallel, cache=self.cache)(self.func)
+        for signature in self.signatures:
+            dispatcher.compile(signature)
+        self._compiled = dispatcher
+        return dispatcher
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        compiled = self._compiled
+        if compiled is None:
+            compiled = self.compile()
+        return compiled(*args, **kwargs)
+
+
+@overload
+def jit(func: Callable[..., Any], /) -> JitKernel: ...
+
+
+@overload
+def jit(
+    *, signatures: Iterable[Any] = (), parallel: bool = False, cache: bool = True
+) -> Callable[[Callable[..., Any]], JitKernel]: ...
+
+
+def jit(
+    func: Callable[..., Any] | None = None,
+    /,
+    *,
+    signatures: Iterable[Any] = (),
+    parallel: bool = False,
+    cache: bool = True,
+):
+    """Compile a pure numeric function with Numba, if it is installed.
+
+    Use it on the kernels called from ``SyncNode.execute_sync``, Numba cannot compile the
+    node or its context. Kernels stored as attributes of a node class are compiled ahead
+    of time by ``Orchestrator.compile(prewarm=True)``.
+
+    Args:
+        func: The function to compile, when used as ``@jit``.
+        signatures: Numba signatures compiled eagerly when the kernel is prewarmed.
+        parallel: Whether Numba parallelizes the function.
+        cache: Whether Numba caches the compiled function on disk.
+
+    Returns:
+        The kernel, or a decorator building it when called with keyword arguments.
+    """
+
+    def decorator(func: Callable[..., Any]) -> JitKernel:
+        return JitKernel(func, signatures, parallel, cache)
+
+    if func is None:
+        return decorator
+    return decorator(func)
@@ -1,10 +0,0 @@
-import asyncio
-
-
-def get_event_loop():
-    try:
-        event_loop = asyncio.get_event_loop()
-    except RuntimeError:
-        event_loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(event_loop)
-    return event_loop
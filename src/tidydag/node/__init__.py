@@ -1,3 +1,21 @@
-from .base import Configuration, ErrorState, Node, NodeState, OrchestratorContext, SuccessState
+from .base import (
+    SUCCESS,
+    Configuration,
+    ErrorState,
+    Node,
+    NodeState,
+    OrchestratorContext,
+    SuccessState,
+    SyncNode,
+)
 
-__all__ = ("Configuration", "Node", "SuccessState", "ErrorState", "NodeState", "OrchestratorContext")
+__all__ = (
+    "Configuration",
+    "Node",
+    "SyncNode",
+    "SUCCESS",
+    "SuccessState",
+    "ErrorState",
+    "NodeState",
+    "OrchestratorContext",
+)
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
 from collections.abc import Iterable
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Generic, Self, TypeVar
+from typing import Any, Final, Generic, Self, TypeVar
 
 import yaml
 from pydantic import BaseModel
@@ -29,14 +30,17 @@ class Configuration(BaseModel):
         return cls.model_validate(data)
 
 
-@dataclass
+@dataclass(slots=True)
 class OrchestratorMetadata:
     executed: set[int] = field(default_factory=set)
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True, frozen=True)
 class OrchestratorContext(Generic[StateT, DepsT]):
-    """Context for a graph."""
+    """Context for a graph.
+
+    The context is frozen, nodes mutate the objects it holds but cannot replace them.
+    """
 
     state: StateT
     """The state of the graph."""
@@ -48,7 +52,7 @@ class OrchestratorContext(Generic[StateT, DepsT]):
     """The metadata of the execution of the graph"""
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class NodeState:
     """The state of a node after execution."""
 
@@ -58,28 +62,39 @@ class NodeState:
     """The reason for failure, if any."""
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SuccessState(NodeState):
     """A successful state for a node."""
 
     success: bool = True
 
 
+SUCCESS: Final = SuccessState()
+"""Shared successful state, nodes can return it instead of building a new one."""
+
+
 class ErrorState(NodeState):
     """An error state for a node."""
 
+    __slots__ = ()
+
     def __init__(self, reason: str):
         """Initialize the error state.
 
         Args:
             reason: The reason for the failure.
         """
-        self.success = False
-        self.reason = reason
+        super().__init__(success=False, reason=reason)
 
 
 class Node(ABC, Generic[ConfigT, StateT, DepsT]):
-    """Base class for a Node"""
+    """Base class for a Node
+
+    The base attributes live in ``__slots__``. Subclasses that declare their own
+    ``__slots__`` for their extra attributes keep instances free of a ``__dict__``.
+    """
+
+    __slots__ = ("parents", "name", "config", "id")
 
     def __init__(
         self,
@@ -102,13 +117,12 @@ class Node(ABC, Generic[ConfigT, StateT, DepsT]):
         self, parents: Node[Any, StateT, DepsT] | Iterable[Node[Any, StateT, DepsT]] | None = None
     ):
         if parents is None:
-            return tuple([])
-        elif isinstance(parents, Node):
-            return tuple([parents])
-        elif isinstance(parents, Iterable) and not isinstance(parents, (str, bytes)):
+            return ()
+        if isinstance(parents, Node):
+            return (parents,)
+        if isinstance(parents, Iterable) and not isinstance(parents, (str, bytes)):
             return tuple(parents)
-        else:
-            raise ValueError("Parents must be a Node or Iterable")
+        raise ValueError("Parents must be a Node or Iterable")
 
     @abstractmethod
     async def execute(self, ctx: OrchestratorContext[StateT, DepsT]) -> NodeState:
@@ -121,3 +135,38 @@ class Node(ABC, Generic[ConfigT, StateT, DepsT]):
             The state of the node after execution.
         """
         raise NotImplementedError
+
+
+class SyncNode(Node[ConfigT, StateT, DepsT]):
+    """Base class for a Node with a synchronous body
+
+    The orchestrator runs ``execute_sync`` in its executor, so blocking or CPU-bound work
+    does not stall the event loop. With a process pool the node, state and deps must be
+    picklable, and changes made to the state in the worker process are not sent back.
+    """
+
+    __slots__ = ()
+
+    @abstractmethod
+    def execute_sync(self, ctx: OrchestratorContext[StateT, DepsT]) -> NodeState:
+        """Execute the node synchronously.
+
+        Args:
+            ctx: The context for the graph.
+
+        Returns:
+            The state of the node after execution.
+        """
+        raise NotImplementedError
+
+    async def execute(self, ctx: OrchestratorContext[StateT, DepsT]) -> NodeState:
+        """Execute the node in the default executor of the running loop.
+
+        Args:
+            ctx: The context for the graph.
+
+        Returns:
+            The state of the node after execution.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.execute_sync, ctx)
@@ -1,16 +1,26 @@
 import asyncio
-from collections.abc import AsyncIterator
+import heapq
+import logging
+import warnings
+from collections import deque
+from collections.abc import Iterable
+from concurrent.futures import Executor
 from dataclasses import dataclass
-from graphlib import TopologicalSorter
-from typing import Any
+from graphlib import CycleError
+from typing import Any, Literal, Self
 
-from .._utils import get_event_loop
-from ..node.base import Node, OrchestratorContext
+from .._jit import JitKernel
+from ..node.base import Node, OrchestratorContext, SyncNode
 
-__all__ = "Orchestrator"
+__all__ = ("Orchestrator", "OrchestratorExecution")
 
+_log = logging.getLogger(__name__)
 
-@dataclass
+SchedulePolicy = Literal["bfs", "dfs", "hybrid"]
+"""Order in which the levels of a compiled graph are laid out."""
+
+
+@dataclass(slots=True)
 class OrchestratorExecution[StateT, DepsT]:
     ctx: OrchestratorContext[StateT, DepsT]
     success: bool
@@ -24,28 +34,158 @@ class Orchestrator[StateT, DepsT]:
     def __init__(
         self,
         ctx: OrchestratorContext[StateT, DepsT] | None = None,
-        step: float = 0.1,
+        step: float | None = None,
+        schedule_policy: SchedulePolicy = "bfs",
+        executor: Executor | None = None,
     ):
         """Initialize the orchestrator.
 
         Args:
-            step: Time to wait between checks for the next ready node.
+            ctx: Context of a previous execution to resume from. A new one is created on
+                run if not provided.
+            step: Deprecated and ignored. Nodes are started as soon as their parents
+                finish, there is no polling interval anymore.
+            schedule_policy: How the graph is scheduled. "bfs" runs every ready node
+                concurrently, starting shallower nodes first, "dfs" runs one node at a time
+                following each node with its children as soon as they are ready, and
+                "hybrid" runs every ready node concurrently, starting them depth-first.
+            executor: Executor that runs the body of SyncNode instances. The default
+                executor of the event loop is used if not provided.
         """
-        self.sorter = TopologicalSorter()
-        self.step = step
-        self.id_counter = 0
-        self.loop = get_event_loop()
+        if schedule_policy not in ("bfs", "dfs", "hybrid"):
+            raise ValueError(f"Unknown schedule policy: {schedule_policy}")
+        if step is not None:
+            warnings.warn(
+                "The step argument of Orchestrator is deprecated and has no effect",
+                DeprecationWarning,
+                stacklevel=2,
+            )
+        self.schedule_policy = schedule_policy
+        self.executor = executor
+        self._runner: asyncio.Runner | None = None
         self.stop = False
         self.ctx: OrchestratorContext[StateT, DepsT] = ctx
         self.execution: OrchestratorExecution = None
+        self._nodes: list[Node[Any, StateT, DepsT]] = []
+        # Position of each node in _nodes, owned by this orchestrator because a node can
+        # be added to several of them
+        self._index: dict[Node[Any, StateT, DepsT], int] = {}
+        # Indexed by node position
+        self._succ: list[list[int]] = []
+        self._pred_count: list[int] = []
+        self._levels: list[tuple[Node[Any, StateT, DepsT], ...]] | None = None
+        # Node positions in schedule order, and the rank of each position in that order
+        self._order: list[int] = []
+        self._rank: list[int] = []
 
     def add_node(self, node: Node[Any, StateT, DepsT]):
         """Add a node to the orchestrator.
 
+        Parents that were not added yet are added first, so nodes are always kept in
+        topological order. The position of a node in that order is the key of its
+        checkpoint and is copied to node.id, a node added to several orchestrators keeps
+        the id given by the last one. Adding a node twice has no effect.
+
         Args:
             node: The node to add.
+
+        Raises:
+            graphlib.CycleError: If the node is in a cycle.
+        """
+        if node in self._index:
+            return
+
+        # Iterative depth-first walk, long chains of parents would overflow recursion
+        stack = [(node, iter(node.parents))]
+        visiting = {node}
+        while stack:
+            current, parents = stack[-1]
+            for parent in parents:
+                if parent in self._index:
+                    continue
+                if parent in visiting:
+                    path = [stacked for stacked, _ in stack]
+                    raise CycleError("nodes are in a cycle", [*path[path.index(parent) :], parent])
+                visiting.add(parent)
+                stack.append((parent, iter(parent.parents)))
+                break
+            else:
+                stack.pop()
+                visiting.discard(current)
+                self._register(current)
+
+        self._levels = None
+
+    def add_nodes(self, nodes: Iterable[Node[Any, StateT, DepsT]]):
+        """Add several nodes to the orchestrator.
+
+        Equivalent to calling add_node on each node, every node is only walked once.
+
+        Args:
+            nodes: The nodes to add.
+
+        Raises:
+            graphlib.CycleError: If a node is in a cycle.
         """
-        self.sorter.add(node, *node.parents)
+        for node in nodes:
+            self.add_node(node)
+
+    def _register(self, node: Node[Any, StateT, DepsT]):
+        position = len(self._nodes)
+        self._index[node] = position
+        node.id = position
+        self._nodes.append(node)
+        self._pred_count.append(len(node.parents))
+        self._succ.append([])
+        for parent in node.parents:
+            self._succ[self._index[parent]].append(position)
+
+    def compile(self, prewarm: bool = False):
+        """Precompute the execution schedule of the graph.
+
+        Nodes are grouped in levels, each level only depends on the previous ones, and the
+        levels laid out following the schedule policy give the order in which ready nodes
+        are started. The schedule is reused by every run until a new node is added.
+
+        Args:
+            prewarm: Compile the jit kernels declared on the node classes now instead of on
+                their first call.
+        """
+        # Nodes are stored parents first, so one pass finds the level of every node
+        index = self._index
+        depth: list[int] = []
+        levels: list[list[Node[Any, StateT, DepsT]]] = []
+        for node in self._nodes:
+            level = max((depth[index[parent]] for parent in node.parents), default=-1) + 1
+            depth.append(level)
+            if level == len(levels):
+                levels.append([])
+            levels[level].append(node)
+        levels = [tuple(level) for level in levels]
+
+        if self.schedule_policy != "bfs":
+            nodes = self._nodes
+            order = _depth_first_order(self._pred_count, self._succ)
+            if self.schedule_policy == "dfs":
+                levels = [(nodes[i],) for i in order]
+            else:
+                rank = [0] * len(order)
+                for position, i in enumerate(order):
+                    rank[i] = position
+                levels = [tuple(sorted(level, key=lambda node: rank[index[node]])) for level in levels]
+
+        self._levels = levels
+        self._order = [index[node] for level in levels for node in level]
+        self._rank = [0] * len(self._order)
+        for position, i in enumerate(self._order):
+            self._rank[i] = position
+
+        if prewarm:
+            for node_type in {type(node) for node in self._nodes}:
+                for cls in node_type.__mro__:
+                    for attribute in vars(cls).values():
+                        if isinstance(attribute, JitKernel):
+                            attribute.compile()
 
     def run_sync(self, state: StateT = None, deps: DepsT = None) -> OrchestratorExecution:
         """Run the orchestrator synchronously.
@@ -53,32 +193,31 @@ class Orchestrator[StateT, DepsT]:
         Args:
             state: The state of the graph.
         """
-        return self.loop.run_until_complete(self.run(state, deps))
-
-    async def iterate(self) -> AsyncIterator[list[tuple[int, Node[Any, StateT, DepsT]]]]:
-        """Iterate over the nodes in the graph as they become ready.
+        # The runner keeps its event loop between calls, close() releases it
+        if self._runner is None:
+            self._runner = asyncio.Runner()
+        return self._runner.run(self.run(state, deps))
 
-        Yields:
-            A tuple containing a unique ID and a single Node instance.
-        """
-        self.sorter.prepare()
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop | None:
+        """The event loop used by run_sync, None until it is first called."""
+        return None if self._runner is None else self._runner.get_loop()
 
-        # Use is_active() if using standard graphlib.TopologicalSorter
-        while self.sorter and not self.stop:
-            node_group = self.sorter.get_ready()
+    def close(self):
+        """Close the event loop used by run_sync.
 
-            if not node_group:
-                # If no nodes are ready, wait and check again
-                await asyncio.sleep(self.step)
-                continue
+        Using the orchestrator as a context manager closes it on exit. The orchestrator can
+        still be run afterwards, run_sync then creates a new loop.
+        """
+        if self._runner is not None:
+            self._runner.close()
+            self._runner = None
 
-            # Create a batch of (id, node) pairs for this dependency level
-            batch = []
-            for node in node_group:
-                self.id_counter += 1
-                batch.append((self.id_counter, node))
+    def __enter__(self) -> Self:
+        return self
 
-            yield batch  # Yield the entire ready-to-run group
+    def __exit__(self, *exc_info: object):
+        self.close()
 
     async def run(self, state: StateT = None, deps: DepsT = None) -> OrchestratorExecution:
         """Run the orchestrator.
@@ -89,17 +228,68 @@ class Orchestrator[StateT, DepsT]:
         if self.ctx is None:
             self.ctx = OrchestratorContext(state=state, deps=deps)
         self.execution = OrchestratorExecution(self.ctx, True)
-        try:
-            async with asyncio.TaskGroup() as tg:
-                # The loop spawns tasks into the group
-                async for node_group in self.iterate():
-                    for id, node in node_group:
-                        node.id = id
-                        tg.create_task(self._visit(node))
-
-        except* Exception as e:
-            # 'except*' handles ExceptionGroups (multiple errors at once)
-            print(f"One or more nodes failed: {e}")
+        if self._levels is None:
+            self.compile()
+
+        self.stop = False
+        executed = self.ctx.metadata.executed
+        nodes = self._nodes
+        succ = self._succ
+        order = self._order
+        rank = self._rank
+        remaining = self._pred_count.copy()
+        # dfs runs a single node at a time
+        limit = 1 if self.schedule_policy == "dfs" else len(nodes)
+        # Ranks of the ready nodes, the lowest one is started first
+        ready = [rank[i] for i, count in enumerate(remaining) if count == 0]
+        heapq.heapify(ready)
+        running: dict[asyncio.Task, int] = {}
+        # Bound once, the loop below runs for every node of the graph
+        visit = self._visit
+        collect = self._collect
+        eager_task = asyncio.eager_task_factory
+        loop = asyncio.get_running_loop()
+
+        def release(i: int):
+            # A child is ready once its last parent is checkpointed
+            if i in executed:
+                for child in succ[i]:
+                    remaining[child] -= 1
+                    if remaining[child] == 0:
+                        heapq.heappush(ready, rank[child])
+
+        while True:
+            # Every node ready at once is started, a failure only keeps the next ones back
+            while ready and len(running) < limit and not self.stop:
+                batch = [heapq.heappop(ready) for _ in range(min(len(ready), limit - len(running)))]
+                for position in batch:
+                    i = order[position]
+                    # Nodes checkpointed by a previous run are not run again
+                    if i in executed:
+                        release(i)
+                        continue
+                    # Eager tasks run inline up to their first suspension, the ones that
+                    # finish without suspending never go through the event loop
+                    task = eager_task(loop, visit(nodes[i]))
+                    if task.done():
+                        collect(nodes[i], task)
+                        release(i)
+                    else:
+                        running[task] = i
+            if not running:
+                break
+
+            try:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                for task in running:
+                    task.cancel()
+                await asyncio.wait(running)
+                raise
+            for task in done:
+                i = running.pop(task)
+                collect(nodes[i], task)
+                release(i)
 
         return self.execution
 
@@ -107,27 +297,77 @@ class Orchestrator[StateT, DepsT]:
         self,
         node: Node[Any, StateT, DepsT],
     ):
-        if node.id in self.ctx.metadata.executed:
-            self.sorter.done(node)
-            return True
-
-        node_state = await node.execute(self.ctx)
+        ctx = self.ctx
+        if isinstance(node, SyncNode):
+            loop = asyncio.get_running_loop()
+            node_state = await loop.run_in_executor(self.executor, node.execute_sync, ctx)
+        else:
+            node_state = await node.execute(ctx)
 
         if node_state.success:
-            self._checkpoint(node, self.ctx)
+            self._checkpoint(node, ctx)
+            # Once a node has failed, last_node keeps pointing at it
+            if self.execution.success:
+                self.execution.last_node = node
         else:
-            print(f"Error in node {node.name} , reason: {node_state.reason}")
-            self.stop = True
-            self.execution.success = False
-            self.execution.reason = node_state.reason
+            self._fail(node, node_state.reason)
 
-        self.execution.last_node = node
-        self.sorter.done(node)
         return True
 
+    def _collect(self, node: Node[Any, StateT, DepsT], task: asyncio.Task):
+        # A node cancelled from the inside did not finish either
+        if task.cancelled():
+            self._fail(node, "Node was cancelled")
+        elif (exc := task.exception()) is not None:
+            self._fail(node, repr(exc), exc)
+
+    def _fail(self, node: Node[Any, StateT, DepsT], reason: str | None, exc: BaseException | None = None):
+        """Stop starting new nodes and record the first failing node.
+
+        Args:
+            node: The node that failed.
+            reason: The reason for the failure.
+            exc: The exception raised by the node, if any.
+        """
+        _log.error("Error in node %s, reason: %s", node.name, reason, exc_info=exc)
+        self.stop = True
+        if self.execution.success:
+            self.execution.success = False
+            self.execution.reason = reason
+            self.execution.last_node = node
+
     def _checkpoint(
         self,
         node: Node[Any, StateT, DepsT],
         ctx: OrchestratorContext[StateT, DepsT],
     ):
-        ctx.metadata.executed.add(node.id)
+        ctx.metadata.executed.add(self._index[node])
+
+
+def _depth_first_order(pred_count: list[int], succ: list[list[int]]) -> list[int]:
+    """Topologically sort a graph, visiting the children of a node right after it.
+
+    A node is only visited once all its parents have been: every visit decrements the
+    remaining parent counter of its children, which become ready when it reaches zero.
+
+    Args:
+        pred_count: Number of parents of each node, indexed by node id.
+        succ: Ids of the children of each node, indexed by node id.
+
+    Returns:
+        The node ids in depth-first topological order.
+    """
+    remaining = pred_count.copy()
+    queue = deque(i for i, count in enumerate(remaining) if count == 0)
+    order = []
+    while queue:
+        i = queue.popleft()
+        order.append(i)
+        ready = []
+        for child in succ[i]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                ready.append(child)
+        queue.extendleft(reversed(ready))
+
+    return order
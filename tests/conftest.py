@@ -0,0 +1,17 @@
+import asyncio
+
+import pytest
+
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
+
+# Only known to pytest-asyncio 1.4 and later, older versions use the default loop
+@pytest.hookimpl(optionalhook=True)
+def pytest_asyncio_loop_factories(config, item):
+    """Run the async tests on uvloop when it is installed."""
+    if uvloop is not None:
+        return {"uvloop": uvloop.new_event_loop}
+    return {"asyncio": asyncio.new_event_loop}
@@ -0,0 +1,10 @@
+import functools
+
+import pytest
+from mocks import PERMUTATIONS, make_diamond
+
+
+@pytest.fixture(params=PERMUTATIONS)
+def diamond(request):
+    """Build the a -> (b, c) -> d diamond, inserted in each of the tested orders."""
+    return functools.partial(make_diamond, request.param)
@@ -0,0 +1,86 @@
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from tidydag.node.base import ErrorState, Node, NodeState, OrchestratorContext, SuccessState
+
+# Insertion orders of the a -> (b, c) -> d diamond, as indexes into [a, b, c, d]
+PERMUTATIONS = ((0, 1, 2, 3), (3, 2, 1, 0), (1, 3, 0, 2), (2, 0, 3, 1))
+
+
+@dataclass
+class MockState:
+    flow: list[str] = field(default_factory=list)
+    counter: int = 0
+
+
+class MockNode(Node[Any, MockState]):
+    """Waits, records its name in the state, then raises, fails or reports its success to record.
+
+    The done event is set once the name is recorded, another node can wait for it through
+    wait_for to finish in a known order.
+    """
+
+    __slots__ = ("fail", "wait", "wait_for", "done", "exception", "record")
+
+    def __init__(
+        self,
+        name,
+        parents=None,
+        fail=False,
+        wait=0.0,
+        exception: Exception | None = None,
+        record: Callable[[str], None] | None = None,
+    ):
+        self.fail = fail
+        self.wait = wait
+        self.wait_for: asyncio.Event | None = None
+        self.done = asyncio.Event()
+        self.exception = exception
+        self.record = record
+        super().__init__(name, parents)
+
+    async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
+        if self.wait:
+            await asyncio.sleep(self.wait)
+        if self.wait_for is not None:
+            await self.wait_for.wait()
+        if ctx.state is not None:
+            ctx.state.flow.append(self.name)
+            ctx.state.counter += 1
+        self.done.set()
+        if self.exception is not None:
+            raise self.exception
+        if self.fail:
+            return ErrorState("Triggered Error")
+        if self.record is not None:
+            self.record(self.name)
+        return SuccessState()
+
+
+def make_diamond(
+    perm=(0, 1, 2, 3),
+    node_type: type[MockNode] = MockNode,
+    record: Callable[[str], None] | None = None,
+    waits=(0.0, 0.0, 0.0, 0.0),
+    **c_options,
+) -> tuple[tuple[MockNode, ...], tuple[MockNode, ...]]:
+    """Build the a -> (b, c) -> d diamond.
+
+    Args:
+        perm: Insertion order of the nodes, as indexes into (a, b, c, d).
+        node_type: Class of the nodes.
+        record: Passed to every node.
+        waits: Wait of each of a, b, c and d.
+        **c_options: Extra arguments of node c, e.g. fail or exception.
+
+    Returns:
+        The nodes as (a, b, c, d) and the same nodes in insertion order.
+    """
+    node_a = node_type(name="a", wait=waits[0], record=record)
+    node_b = node_type(name="b", parents=node_a, wait=waits[1], record=record)
+    node_c = node_type(name="c", parents=node_a, wait=waits[2], record=record, **c_options)
+    node_d = node_type(name="d", parents=[node_b, node_c], wait=waits[3], record=record)
+    nodes = (node_a, node_b, node_c, node_d)
+    return nodes, tuple(nodes[i] for i in perm)
@@ -0,0 +1,64 @@
+import sys
+
+import pytest
+
+from tidydag import jit
+from tidydag._jit import JitKernel
+from tidydag.node.base import NodeState, SuccessState, SyncNode
+from tidydag.orchestrator import Orchestrator
+
+
+@pytest.fixture
+def without_numba(monkeypatch):
+    monkeypatch.setitem(sys.modules, "numba", None)
+
+
+def test_jit_falls_back_without_numba(without_numba):
+    @jit
+    def add(x, y):
+        return x + y
+
+    assert isinstance(add, JitKernel)
+    assert add(1, 2) == 3
+    assert add.compile() is add.func
+    assert add.__name__ == "add"
+
+
+def test_jit_with_options(without_numba):
+    @jit(signatures=["int64(int64)"], parallel=True, cache=False)
+    def double(x):
+        return 2 * x
+
+    assert double(4) == 8
+    assert double.signatures == ("int64(int64)",)
+    assert double.parallel
+    assert not double.cache
+
+
+def test_orchestrator_prewarm_compiles_node_kernels(without_numba):
+    @jit
+    def square(x):
+        return x * x
+
+    class MockNode(SyncNode):
+        __slots__ = ()
+
+        kernel = square
+
+        def execute_sync(self, ctx) -> NodeState:
+            ctx.state.append(self.kernel(3))
+            return SuccessState()
+
+    orchestrator = Orchestrator()
+    orchestrator.add_node(MockNode(name="a"))
+
+    orchestrator.compile()
+    assert square._compiled is None
+
+    orchestrator.compile(prewarm=True)
+    assert square._compiled is square.func
+
+    state = []
+    orchestrator.run_sync(state=state)
+    orchestrator.close()
+    assert state == [9]
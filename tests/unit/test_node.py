@@ -1,8 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import FrozenInstanceError, dataclass
 
 import pytest
 
 from tidydag import Node
+from tidydag.node.base import SUCCESS, ErrorState, SuccessState
 
 
 def test_node_has_parents():
@@ -13,9 +14,10 @@ def test_node_has_parents():
     node_a = MockNode(name="node1")
     node_b = MockNode(name="node2", parents=node_a)
 
-    assert node_a.parents is tuple([])
+    assert node_a.parents == ()
     assert node_a in node_b.parents
-    assert node_a.id == node_b.parents[0].id
+    assert node_b.parents[0] is node_a
+    assert node_a.id is None
 
 
 def test_wrong_parent():
@@ -40,3 +42,28 @@ def test_node_config():
     node = MockNode(config=config)
 
     assert node.config.version == 3
+
+
+def test_node_slots():
+    class MockNode(Node):
+        __slots__ = ("fail",)
+
+        async def execute(self, ctx):
+            pass
+
+    node = MockNode(name="node1")
+    node.fail = True
+
+    assert not hasattr(node, "__dict__")
+    assert not hasattr(SuccessState(), "__dict__")
+    assert not hasattr(ErrorState("Triggered Error"), "__dict__")
+
+
+def test_success_singleton():
+    assert isinstance(SUCCESS, SuccessState)
+    assert SUCCESS.success
+    assert SUCCESS.reason is None
+    assert SuccessState() == SUCCESS
+
+    with pytest.raises(FrozenInstanceError):
+        SUCCESS.success = False
@@ -1,31 +1,25 @@
-import random
-from dataclasses import dataclass
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import FrozenInstanceError
+from graphlib import CycleError
 
-from tidydag.node.base import ErrorState, Node, NodeState, OrchestratorContext, SuccessState
+import pytest
+from mocks import MockNode, MockState, make_diamond
+
+from tidydag.node.base import NodeState, OrchestratorContext, SuccessState, SyncNode
 from tidydag.orchestrator import Orchestrator
 
 
-def test_orchestrator_order():
+def test_orchestrator_order(diamond):
     flow = []
 
-    class MockNode(Node):
-        async def execute(self, ctx):
-            flow.append(self.name)
-            return SuccessState()
-
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
-
-    node_collection = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+    _, node_collection = diamond(record=flow.append)
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     result = orchestrator.run_sync()
+    orchestrator.close()
     assert result.success
     assert result.last_node.name == "d"
     flow_dict = {name: i for i, name in enumerate(flow)}
@@ -37,58 +31,28 @@ def test_orchestrator_order():
     assert flow_dict["c"] < flow_dict["d"]
 
 
-def test_orchestrator_state_mutation():
-    @dataclass
-    class MockState:
-        counter: int = 0
-
-    class MockNode(Node[MockState]):
-        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
-            ctx.state.counter += 1
-            return SuccessState()
-
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
-
-    node_collection: list[MockNode] = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+def test_orchestrator_state_mutation(diamond):
+    _, node_collection = diamond()
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     state = MockState()
     orchestrator.run_sync(state=state)
+    orchestrator.close()
 
     assert state.counter == 4
 
 
-def test_orchestrator_state_ordered_mutation():
-    @dataclass
-    class MockState:
-        flow: tuple = tuple([])
-
-    class MockNode(Node[MockState]):
-        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
-            ctx.state.flow = tuple([*ctx.state.flow, self.name])
-            return SuccessState()
-
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
-
-    node_collection: list[MockNode] = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+def test_orchestrator_state_ordered_mutation(diamond):
+    _, node_collection = diamond()
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     state = MockState()
     orchestrator.run_sync(state=state)
+    orchestrator.close()
     flow_dict = {name: i for i, name in enumerate(state.flow)}
 
     assert flow_dict["a"] < flow_dict["b"]
@@ -98,36 +62,15 @@ def test_orchestrator_state_ordered_mutation():
     assert flow_dict["c"] < flow_dict["d"]
 
 
-def test_orchestrator_fail():
-    @dataclass
-    class MockState:
-        flow: tuple = tuple([])
-
-    class MockNode(Node[MockState]):
-        def __init__(self, name, parents=None, fail=False):
-            self.fail = fail
-            super().__init__(name, parents)
-
-        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
-            ctx.state.flow = tuple([*ctx.state.flow, self.name])
-            if self.fail:
-                return ErrorState("Triggered Error")
-            return SuccessState()
-
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a, fail=True)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
-
-    node_collection: list[MockNode] = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+def test_orchestrator_fail(diamond):
+    _, node_collection = diamond(fail=True)
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     state = MockState()
     result = orchestrator.run_sync(state=state)
+    orchestrator.close()
     assert not result.success
     assert result.last_node.name == "c"
 
@@ -139,106 +82,48 @@ def test_orchestrator_fail():
     assert "d" not in flow_dict
 
 
-def test_orchestrator_checkpoint():
-    @dataclass
-    class MockState:
-        flow: tuple = tuple([])
-
-    class MockNode(Node[MockState]):
-        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
-            ctx.state.flow = tuple([*ctx.state.flow, self.name])
-            return SuccessState()
-
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
-
-    node_collection: list[MockNode] = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+def test_orchestrator_checkpoint(diamond):
+    _, node_collection = diamond()
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     state = MockState()
     orchestrator.run_sync(state=state)
+    orchestrator.close()
 
     for node in node_collection:
         assert node.id in orchestrator.ctx.metadata.executed
 
 
-def test_orchestrator_fail_checkpoint():
-    @dataclass
-    class MockState:
-        flow: tuple = tuple([])
-
-    class MockNode(Node[MockState]):
-        def __init__(self, name, parents=None, fail=False):
-            self.fail = fail
-            super().__init__(name, parents)
-
-        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
-            ctx.state.flow = tuple([*ctx.state.flow, self.name])
-            if self.fail:
-                return ErrorState("Triggered Error")
-            return SuccessState()
-
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a, fail=True)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
-
-    node_collection: list[MockNode] = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+def test_orchestrator_fail_checkpoint(diamond):
+    (node_a, _, node_c, node_d), node_collection = diamond(fail=True)
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     state = MockState()
     orchestrator.run_sync(state=state)
+    orchestrator.close()
 
     assert node_a.id in orchestrator.ctx.metadata.executed
     assert node_c.id not in orchestrator.ctx.metadata.executed
     assert node_d.id not in orchestrator.ctx.metadata.executed
 
 
-def test_orchestrator_resume_checkpoint():
+def test_orchestrator_resume_checkpoint(diamond):
     executions = []
 
-    @dataclass
-    class MockState:
-        flow: tuple = tuple([])
-
-    class MockNode(Node[MockState]):
-        def __init__(self, name, parents=None, fail=False):
-            self.fail = fail
-            super().__init__(name, parents)
-
-        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
-            if self.fail:
-                return ErrorState("Triggered Error")
-            ctx.state.flow = tuple([*ctx.state.flow, self.name])
-            executions.append(self.id)
-            return SuccessState()
-
     # Build an orchestrator that fails
 
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a, fail=True)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
-
-    node_collection: list[MockNode] = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+    (node_a, _, node_c, node_d), node_collection = diamond(record=executions.append, fail=True)
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     state = MockState()
     orchestrator.run_sync(state=state)
+    orchestrator.close()
 
     # Assert that the process has failed
     assert node_a.id in orchestrator.ctx.metadata.executed
@@ -253,11 +138,11 @@ def test_orchestrator_resume_checkpoint():
     node_c.fail = False
 
     resume_orchestrator = Orchestrator(ctx)
-    for node in node_collection:
-        resume_orchestrator.add_node(node)
+    resume_orchestrator.add_nodes(node_collection)
 
     state = MockState()
     resume_orchestrator.run_sync(state=state)
+    resume_orchestrator.close()
 
     # Assert that all nodes finish
     for node in node_collection:
@@ -265,3 +150,186 @@ def test_orchestrator_resume_checkpoint():
 
     # Check that all executions are there and none duplicated
     assert len(executions) == 4
+
+
+def test_orchestrator_compile_levels():
+    _, node_collection = make_diamond((0, 2, 1, 3))
+
+    orchestrator = Orchestrator()
+    orchestrator.add_nodes(node_collection)
+    orchestrator.compile()
+
+    assert [{node.name for node in level} for level in orchestrator._levels] == [{"a"}, {"b", "c"}, {"d"}]
+    assert [node.id for node in node_collection] == [0, 1, 2, 3]
+
+
+def test_orchestrator_add_node_cycle():
+    node_a = MockNode(name="a")
+    node_b = MockNode(name="b", parents=node_a)
+    node_a.parents = (node_b,)
+
+    orchestrator = Orchestrator()
+
+    with pytest.raises(CycleError):
+        orchestrator.add_node(node_a)
+
+
+def test_orchestrator_dfs_policy():
+    flow = []
+
+    node_a = MockNode(name="a", record=flow.append)
+    node_b = MockNode(name="b", parents=node_a, record=flow.append)
+    node_c = MockNode(name="c", parents=node_a, record=flow.append)
+    node_d = MockNode(name="d", parents=node_b, record=flow.append)
+    node_e = MockNode(name="e", parents=node_c, record=flow.append)
+
+    orchestrator = Orchestrator(schedule_policy="dfs")
+    orchestrator.add_nodes((node_a, node_b, node_c, node_d, node_e))
+
+    result = orchestrator.run_sync()
+    orchestrator.close()
+
+    assert result.success
+    assert flow == ["a", "b", "d", "c", "e"]
+
+
+def test_orchestrator_hybrid_policy():
+    node_a = MockNode(name="a")
+    node_b = MockNode(name="b", parents=node_a)
+    node_c = MockNode(name="c", parents=node_a)
+    node_d = MockNode(name="d", parents=node_b)
+    node_e = MockNode(name="e", parents=node_c)
+
+    orchestrator = Orchestrator(schedule_policy="hybrid")
+    orchestrator.add_nodes((node_e, node_d, node_c, node_b, node_a))
+    orchestrator.compile()
+
+    levels = [[node.name for node in level] for level in orchestrator._levels]
+    assert levels == [["a"], ["c", "b"], ["e", "d"]]
+
+
+def test_orchestrator_unknown_policy():
+    with pytest.raises(ValueError):
+        Orchestrator(schedule_policy="random")
+
+
+def test_orchestrator_step_is_deprecated():
+    with pytest.warns(DeprecationWarning):
+        Orchestrator(step=0.1)
+
+
+def test_orchestrator_adds_missing_parents():
+    flow = []
+
+    (_, node_b, _, node_d), _ = make_diamond(record=flow.append)
+
+    orchestrator = Orchestrator()
+    orchestrator.add_node(node_d)
+    orchestrator.add_node(node_b)
+
+    result = orchestrator.run_sync()
+    orchestrator.close()
+
+    assert result.success
+    assert sorted(flow) == ["a", "b", "c", "d"]
+    assert flow[0] == "a"
+    assert flow[-1] == "d"
+
+
+def test_orchestrator_context_is_frozen():
+    ctx = OrchestratorContext(state=MockState(), deps=None)
+    ctx.state.counter += 1
+
+    assert ctx.state.counter == 1
+    with pytest.raises(FrozenInstanceError):
+        ctx.state = MockState()
+
+
+def test_orchestrator_public_exports():
+    import tidydag
+    import tidydag.orchestrator
+
+    assert tidydag.Orchestrator is Orchestrator
+    assert set(tidydag.orchestrator.__all__) == {"Orchestrator", "OrchestratorExecution"}
+
+
+def test_orchestrator_sync_node_runs_in_executor():
+    threads = {}
+
+    class MockNode(SyncNode):
+        __slots__ = ()
+
+        def execute_sync(self, ctx) -> NodeState:
+            threads[self.name] = threading.get_ident()
+            return SuccessState()
+
+    node_a = MockNode(name="a")
+    node_b = MockNode(name="b", parents=node_a)
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="tidydag") as executor:
+        orchestrator = Orchestrator(executor=executor)
+        orchestrator.add_node(node_a)
+        orchestrator.add_node(node_b)
+        result = orchestrator.run_sync()
+        orchestrator.close()
+
+    assert result.success
+    assert result.last_node is node_b
+    assert threading.get_ident() not in threads.values()
+    assert set(threads) == {"a", "b"}
+
+
+def test_orchestrator_long_chain():
+    nodes = [MockNode(name="0")]
+    for i in range(1, 5000):
+        nodes.append(MockNode(name=str(i), parents=nodes[-1]))
+
+    orchestrator = Orchestrator()
+    orchestrator.add_node(nodes[-1])
+    orchestrator.compile()
+
+    assert [node.id for node in nodes] == list(range(5000))
+    assert len(orchestrator._levels) == 5000
+
+
+def test_orchestrator_run_sync_reuses_loop():
+    calls = []
+    orchestrator = Orchestrator()
+    orchestrator.add_node(MockNode(name="a", record=calls.append))
+    assert orchestrator.loop is None
+
+    assert orchestrator.run_sync().success
+    loop = orchestrator.loop
+    # A new context for every run, the previous one has already checkpointed the node
+    orchestrator.ctx = None
+    assert orchestrator.run_sync().success
+    assert orchestrator.loop is loop
+    assert calls == ["a", "a"]
+
+    orchestrator.close()
+    assert loop.is_closed()
+    assert orchestrator.loop is None
+    orchestrator.ctx = None
+    with orchestrator:
+        assert orchestrator.run_sync().success
+        assert not orchestrator.loop.is_closed()
+    assert orchestrator.loop is None
+    assert calls == ["a", "a", "a"]
+
+
+def test_orchestrator_node_in_two_orchestrators():
+    flow = []
+    (node_a, _, _, node_d), node_collection = make_diamond(record=flow.append)
+
+    orchestrator = Orchestrator()
+    orchestrator.add_nodes(node_collection)
+    other = Orchestrator()
+    other.add_nodes((MockNode(name="x"), node_d))
+    orchestrator.add_node(node_a)
+
+    assert len(orchestrator._nodes) == 4
+    assert orchestrator.run_sync().success
+    orchestrator.close()
+    assert sorted(flow) == ["a", "b", "c", "d"]
+    assert orchestrator.ctx.metadata.executed == {0, 1, 2, 3}
+    orchestrator.close()
@@ -1,41 +1,25 @@
 import asyncio
-import random
-from dataclasses import dataclass
+import contextvars
+import logging
 
 import pytest
+from mocks import MockNode, MockState, make_diamond
 
 from tidydag.node import ErrorState
-from tidydag.node.base import Node, NodeState, OrchestratorContext, SuccessState
+from tidydag.node.base import NodeState, OrchestratorContext
 from tidydag.orchestrator import Orchestrator
 
 
 @pytest.mark.asyncio
-async def test_orchestrator_order():
+async def test_orchestrator_order(diamond):
     flow = []
 
-    class MockNode(Node):
-        def __init__(self, name, parents=None, wait=5):
-            self.wait = wait
-            super().__init__(name, parents)
-
-        async def execute(self, ctx: OrchestratorContext) -> NodeState:
-            print(f"Node {self.name}, waiting for {self.wait}")
-            await asyncio.sleep(self.wait)
-            print(f"Node {self.name} finished waiting")
-            flow.append(self.name)
-            return SuccessState()
-
-    node_a = MockNode(name="a", wait=0.1)
-    node_b = MockNode(name="b", parents=node_a, wait=0.2)
-    node_c = MockNode(name="c", parents=node_a, wait=0.3)
-    node_d = MockNode(name="d", parents=[node_b, node_c], wait=0.1)
-
-    node_collection = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+    (_, node_b, node_c, _), node_collection = diamond(record=flow.append)
+    # c only finishes after b, whatever order they are started in
+    node_c.wait_for = node_b.done
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     result = await orchestrator.run()
 
@@ -52,33 +36,11 @@ async def test_orchestrator_order():
 
 
 @pytest.mark.asyncio
-async def test_orchestrator_fail():
-    @dataclass
-    class MockState:
-        flow: tuple = tuple([])
-
-    class MockNode(Node[MockState]):
-        def __init__(self, name, parents=None, fail=False):
-            self.fail = fail
-            super().__init__(name, parents)
-
-        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
-            ctx.state.flow = tuple([*ctx.state.flow, self.name])
-            if self.fail:
-                return ErrorState("Triggered Error")
-            return SuccessState()
-
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a, fail=True)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
-
-    node_collection: list[MockNode] = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+async def test_orchestrator_fail(diamond):
+    _, node_collection = diamond(fail=True)
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     state = MockState()
     result = await orchestrator.run(state=state)
@@ -93,39 +55,20 @@ async def test_orchestrator_fail():
 
 
 @pytest.mark.asyncio
-async def test_orchestrator_fail_with_exceptions():
-    @dataclass
-    class MockState:
-        flow: tuple = tuple([])
-
-    class MockNode(Node[MockState]):
-        def __init__(self, name, parents=None, fail=False):
-            self.fail = fail
-            super().__init__(name, parents)
-
-        def raise_dummy_exception(self):
-            raise ValueError("Dummy Error")
+async def test_orchestrator_fail_with_exceptions(diamond):
+    class CatchingNode(MockNode):
+        __slots__ = ()
 
         async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
-            ctx.state.flow = tuple([*ctx.state.flow, self.name])
-            if self.fail:
-                try:
-                    self.raise_dummy_exception()
-                except Exception as e:
-                    return ErrorState(f"Triggered Error: {e}")
-            return SuccessState()
-
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a, fail=True)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
+            try:
+                return await super().execute(ctx)
+            except Exception as e:
+                return ErrorState(f"Triggered Error: {e}")
 
-    node_collection: list[MockNode] = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+    _, node_collection = diamond(node_type=CatchingNode, exception=ValueError("Dummy Error"))
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     state = MockState()
     await orchestrator.run(state=state)
@@ -138,27 +81,11 @@ async def test_orchestrator_fail_with_exceptions():
 
 
 @pytest.mark.asyncio
-async def test_orchestrator_checkpoint():
-    @dataclass
-    class MockState:
-        flow: tuple = tuple([])
-
-    class MockNode(Node[MockState]):
-        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
-            ctx.state.flow = tuple([*ctx.state.flow, self.name])
-            return SuccessState()
-
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
-
-    node_collection: list[MockNode] = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+async def test_orchestrator_checkpoint(diamond):
+    _, node_collection = diamond()
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     state = MockState()
     await orchestrator.run(state=state)
@@ -168,33 +95,11 @@ async def test_orchestrator_checkpoint():
 
 
 @pytest.mark.asyncio
-async def test_orchestrator_fail_checkpoint():
-    @dataclass
-    class MockState:
-        flow: tuple = tuple([])
-
-    class MockNode(Node[MockState]):
-        def __init__(self, name, parents=None, fail=False):
-            self.fail = fail
-            super().__init__(name, parents)
-
-        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
-            ctx.state.flow = tuple([*ctx.state.flow, self.name])
-            if self.fail:
-                return ErrorState("Triggered Error")
-            return SuccessState()
-
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a, fail=True)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
-
-    node_collection: list[MockNode] = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+async def test_orchestrator_fail_checkpoint(diamond):
+    (node_a, _, node_c, node_d), node_collection = diamond(fail=True)
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     state = MockState()
     await orchestrator.run(state=state)
@@ -205,38 +110,15 @@ async def test_orchestrator_fail_checkpoint():
 
 
 @pytest.mark.asyncio
-async def test_orchestrator_resume_checkpoint():
+async def test_orchestrator_resume_checkpoint(diamond):
     executions = []
 
-    @dataclass
-    class MockState:
-        flow: tuple = tuple([])
-
-    class MockNode(Node[MockState]):
-        def __init__(self, name, parents=None, fail=False):
-            self.fail = fail
-            super().__init__(name, parents)
-
-        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
-            if self.fail:
-                return ErrorState("Triggered Error")
-            ctx.state.flow = tuple([*ctx.state.flow, self.name])
-            executions.append(self.id)
-            return SuccessState()
-
     # Build an orchestrator that fails
 
-    node_a = MockNode(name="a")
-    node_b = MockNode(name="b", parents=node_a)
-    node_c = MockNode(name="c", parents=node_a, fail=True)
-    node_d = MockNode(name="d", parents=[node_b, node_c])
-
-    node_collection: list[MockNode] = [node_a, node_b, node_c, node_d]
-    random.shuffle(node_collection)
+    (node_a, _, node_c, node_d), node_collection = diamond(record=executions.append, fail=True)
 
     orchestrator = Orchestrator()
-    for node in node_collection:
-        orchestrator.add_node(node)
+    orchestrator.add_nodes(node_collection)
 
     state = MockState()
     await orchestrator.run(state=state)
@@ -254,8 +136,7 @@ async def test_orchestrator_resume_checkpoint():
     node_c.fail = False
 
     resume_orchestrator = Orchestrator(ctx)
-    for node in node_collection:
-        resume_orchestrator.add_node(node)
+    resume_orchestrator.add_nodes(node_collection)
 
     state = MockState()
     await resume_orchestrator.run(state=state)
@@ -266,3 +147,166 @@ async def test_orchestrator_resume_checkpoint():
 
     # Check that all executions are there and none duplicated
     assert len(executions) == 4
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_node_raises(caplog):
+    flow = []
+
+    (_, _, node_c, _), node_collection = make_diamond(record=flow.append, exception=ValueError("Dummy Error"))
+
+    orchestrator = Orchestrator()
+    orchestrator.add_nodes(node_collection)
+
+    with caplog.at_level(logging.ERROR, logger="tidydag.orchestrator"):
+        result = await orchestrator.run()
+
+    assert not result.success
+    assert result.last_node is node_c
+    assert caplog.records[0].exc_info[0] is ValueError
+    assert "Dummy Error" in result.reason
+    assert "b" in flow
+    assert "d" not in flow
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_nodes_run_in_their_own_task():
+    tasks = {}
+    seen = {}
+    var = contextvars.ContextVar("var", default=None)
+
+    class TaskNode(MockNode):
+        __slots__ = ()
+
+        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
+            seen[self.name] = var.get()
+            var.set(self.name)
+            node_state = await super().execute(ctx)
+            tasks[self.name] = asyncio.current_task()
+            return node_state
+
+    (_, _, node_c, _), node_collection = make_diamond(node_type=TaskNode, waits=(0.0, 0.0, 0.001, 0.0))
+
+    orchestrator = Orchestrator()
+    orchestrator.add_nodes(node_collection)
+    result = await orchestrator.run(state=MockState())
+
+    assert result.success
+    assert node_c.id in orchestrator.ctx.metadata.executed
+    # Suspending or not, every node has its own task and context
+    assert len(set(tasks.values())) == 4
+    assert asyncio.current_task() not in tasks.values()
+    assert seen == {"a": None, "b": None, "c": None, "d": None}
+    assert var.get() is None
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_node_timeout():
+    class TimeoutNode(MockNode):
+        __slots__ = ()
+
+        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
+            try:
+                async with asyncio.timeout(0.001):
+                    await asyncio.sleep(1)
+            except TimeoutError:
+                return ErrorState("Timed out")
+            return await super().execute(ctx)
+
+    node_a = MockNode(name="a")
+    node_b = TimeoutNode(name="b", parents=node_a)
+
+    orchestrator = Orchestrator()
+    orchestrator.add_nodes((node_a, node_b))
+    result = await orchestrator.run()
+
+    assert not result.success
+    assert result.reason == "Timed out"
+    assert result.last_node is node_b
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_node_task_group():
+    class GroupNode(MockNode):
+        __slots__ = ()
+
+        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
+            async def child():
+                raise ValueError("Dummy Error")
+
+            try:
+                async with asyncio.TaskGroup() as group:
+                    group.create_task(asyncio.sleep(1))
+                    group.create_task(child())
+            except ExceptionGroup:
+                return ErrorState("Child failed")
+            return await super().execute(ctx)
+
+    node_a = MockNode(name="a")
+    node_b = GroupNode(name="b", parents=node_a)
+    node_c = MockNode(name="c", parents=node_a)
+
+    orchestrator = Orchestrator()
+    orchestrator.add_nodes((node_a, node_b, node_c))
+    result = await orchestrator.run()
+
+    assert not result.success
+    assert result.reason == "Child failed"
+    assert node_c.id in orchestrator.ctx.metadata.executed
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_cancel_suspended_node():
+    (node_a, _, _, _), node_collection = make_diamond(waits=(10.0, 0.0, 0.0, 0.0))
+
+    orchestrator = Orchestrator()
+    orchestrator.add_nodes(node_collection)
+    task = asyncio.create_task(orchestrator.run(state=MockState()))
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert node_a.id not in orchestrator.ctx.metadata.executed
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_node_cancelled():
+    class CancelledNode(MockNode):
+        __slots__ = ()
+
+        async def execute(self, ctx: OrchestratorContext[MockState]) -> NodeState:
+            future = asyncio.get_running_loop().create_future()
+            future.cancel()
+            await future
+            return await super().execute(ctx)
+
+    flow = []
+    node_a = CancelledNode(name="a")
+    node_b = MockNode(name="b", parents=node_a, record=flow.append)
+
+    orchestrator = Orchestrator()
+    orchestrator.add_nodes((node_a, node_b))
+    result = await orchestrator.run()
+
+    assert not result.success
+    assert result.last_node is node_a
+    assert node_a.id not in orchestrator.ctx.metadata.executed
+    assert flow == []
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_starts_children_without_waiting_for_unrelated_nodes():
+    node_a = MockNode(name="a")
+    node_b = MockNode(name="b", parents=node_a)
+    node_c = MockNode(name="c")
+    # c can only finish once b has run, a barrier between a and b would never release
+    node_c.wait_for = node_b.done
+
+    orchestrator = Orchestrator()
+    orchestrator.add_nodes((node_a, node_b, node_c))
+    async with asyncio.timeout(1):
+        result = await orchestrator.run(state=MockState())
+
+    assert result.success
+    assert orchestrator.ctx.metadata.executed == {0, 1, 2}